@@ -1,7 +1,8 @@
 import asyncio
 import argparse
 import json
-from typing import Any
+import sys
+from typing import Any, List
 
 from multilspy import SyncLanguageServer
 from multilspy.multilspy_config import MultilspyConfig
@@ -9,8 +10,20 @@ from multilspy.multilspy_logger import MultilspyLogger
 
 from multispy_xcode_build_server.server import XcodeBuildServer
 
-def print_result(result: Any):
-    print(json.dumps(result, indent=4))
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def print_results(results: List[Any]):
+    """Writes all results to stdout at once, as one indented JSON document per result."""
+    if orjson is not None:
+        out = b"\n".join(orjson.dumps(result, option=orjson.OPT_INDENT_2) for result in results)
+    else:
+        out = "\n".join(json.dumps(result, indent=2) for result in results).encode()
+    sys.stdout.flush()
+    sys.stdout.buffer.write(out + b"\n")
+    sys.stdout.buffer.flush()
 async def main():
 
     parser = argparse.ArgumentParser()
@@ -38,20 +51,17 @@ async def main():
         line = LINE
         column = COLUMN
         print("started")
-        result = await lsp.request_definition(FILE_PATH, line, column)
-        print_result(result)
+        # These requests are read-only and independent, so they are sent concurrently
+        definition, hover, document_symbols = await asyncio.gather(
+            lsp.request_definition(FILE_PATH, line, column),
+            lsp.request_hover(FILE_PATH, line, column),
+            lsp.request_document_symbols(FILE_PATH),
+        )
 
-        result = await lsp.request_hover(FILE_PATH, line, column)
-        print_result(result)
+        rename_edits = await lsp.request_rename(FILE_PATH, line, column, "new_name")
+        workspace_symbols = await lsp.request_workspace_symbols(" ")
 
-        result = await lsp.request_document_symbols(FILE_PATH)
-        print_result(result)
-
-        result = await lsp.request_rename(FILE_PATH, line, column, "new_name")
-        print_result(result)
-
-        result = await lsp.request_workspace_symbols(" ")
-        print_result(result)
+        print_results([definition, hover, document_symbols, rename_edits, workspace_symbols])
 
 if __name__ == "__main__":
     asyncio.run(main())
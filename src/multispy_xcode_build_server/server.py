@@ -1,13 +1,20 @@
 import asyncio
+import collections
+import copy
+import itertools
 import json
 import logging
+import mmap
 import os
+import time
 from pathlib import PurePath
 import pathlib
-from typing import Dict, List, Optional, TypedDict, Union, Any
-from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypedDict, Union, Any
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
 from typing_extensions import NotRequired
+from urllib.parse import quote
 
 import uuid
 from multilspy.language_server import LanguageServer
@@ -19,6 +26,39 @@ from multilspy.lsp_protocol_handler.lsp_types import InitializeParams
 from multilspy import multilspy_types
 from multilspy.multilspy_exceptions import MultilspyException
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The initialize request template is static, so it is parsed once, on the first
+# server start; ``_get_initialize_params`` only fills in the per-workspace fields.
+_INIT_TEMPLATE_PATH = PurePath(os.path.dirname(__file__), "initialize_params.json")
+_INIT_TEMPLATE: Optional[InitializeParams] = None
+
+def _load_init_template() -> InitializeParams:
+    # Map the file instead of reading it, orjson parses straight out of the page cache
+    with open(str(_INIT_TEMPLATE_PATH), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if orjson is not None:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+        return json.loads(mm[:])
+
+# Blank workspace/symbol queries return every symbol in the workspace; only the
+# first symbols up to this limit are converted unless the caller asks for more.
+_WORKSPACE_SYMBOLS_LIMIT = 10000
+
+# Cached full-workspace symbol listings are refetched after this many seconds, since sourcekit-lsp is not told
+# about edits made on disk to files that are not open.
+_WORKSPACE_SYMBOLS_TTL = 30.0
+
+# Rename responses with more edits than this are converted off the event loop.
+_RENAME_OFFLOAD_THRESHOLD = 1000
+
+# Clients fire bursts of near-identical hover/definition requests while the cursor
+# moves; requests for the same position within this window share one round-trip.
+_DEBOUNCE_SECONDS = 0.020
+
 class TextEdit(TypedDict):
     """Represents a text edit operation to be performed on a document."""
     range: multilspy_types.Range
@@ -37,6 +77,95 @@ class WorkspaceSymbol(TypedDict):
     containerName: NotRequired[str]
     data: NotRequired[Any]
 
+@lru_cache(maxsize=4096)
+def _uri_for(root_uri: str, relative_file_path: str) -> str:
+    """
+    Returns the file URI for the given path relative to the repository with the given root URI.
+    """
+    if os.path.isabs(relative_file_path):
+        return pathlib.Path(relative_file_path).as_uri()
+    return f"{root_uri}/{quote(PurePath(relative_file_path).as_posix())}"
+
+def _parse_rename_response(response: Dict[str, Any]) -> Dict[str, List[TextEdit]]:
+    """
+    Converts the "changes" of a textDocument/rename response into a mapping from file URIs to text edits.
+    """
+    # TextEdit is a TypedDict, so plain dict literals are built instead of calling it per edit
+    return {
+        uri: [{"range": change["range"], "newText": change["newText"]} for change in changes]
+        for uri, changes in response["changes"].items()
+    }
+
+_COMPLETION_TRIGGER_CHARACTERS = [".", "@", "#", "*", " "]
+
+async def _execute_client_command_handler(params):
+    #assert params["command"] == "_java.reloadBundles.command"
+    #assert params["arguments"] == []
+    return []
+
+async def _do_nothing(params):
+    return
+
+class _LRU(collections.OrderedDict):
+    """A bounded mapping that evicts the least recently inserted or touched entry once full."""
+
+    def __init__(self, maxsize: int = 500):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+class _CoalescingWriter:
+    """
+    Wraps the stdin StreamWriter of the Language Server process and buffers the messages written to it,
+    flushing everything written during one event loop iteration with a single write.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self._chunks: List[bytes] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    def write(self, data: bytes) -> None:
+        self.writelines((data,))
+
+    def writelines(self, data) -> None:
+        self._chunks.extend(data)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks.clear()
+            self.writer.write(data)
+
+    async def drain(self) -> None:
+        if self._flush_handle is not None:
+            # The pending flush was scheduled before this task resumes, so the buffered messages are written
+            # by then and backpressure applies to them as well
+            await asyncio.sleep(0)
+        await self.writer.drain()
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+_SOURCEKIT_LSP_CMD = " ".join(
+    [
+        "sourcekit-lsp"
+    ]
+)
+
+# Instances handed out by XcodeBuildServer.get, keyed by (command, absolute repository root, config)
+_SERVER_POOL: Dict[Tuple[str, str, str], "XcodeBuildServer"] = {}
+
 class XcodeBuildServer(LanguageServer):
     """
     Main class for the Xcode build server implementation
@@ -48,59 +177,105 @@ class XcodeBuildServer(LanguageServer):
         This class is not meant to be instantiated directly. Use LanguageServer.create() instead.
         """
 
+        # Canonicalize once, so that nothing downstream needs to resolve the root against the working directory again
+        repository_root_path = os.path.abspath(repository_root_path)
+
         proc_env = {}
         proc_cwd = repository_root_path
-        cmd = " ".join(
-            [
-                "sourcekit-lsp"
-            ]
-        )
+        cmd = _SOURCEKIT_LSP_CMD
 
         self.service_ready_event = asyncio.Event()
+        self._start_lock = asyncio.Lock()
+        self._process_started = False
+        self._refcount = 0
+        self._exit_stack: Optional[AsyncExitStack] = None
+
+        self._root_uri = pathlib.Path(repository_root_path).as_uri()
+        self._root_basename = os.path.basename(repository_root_path)
+
+        # Responses are cached per file state, see _document_state. Cached values
+        # are shared between callers and must not be mutated.
+        self._hover_cache = _LRU()
+        self._def_cache = _LRU()
+        self._symbols_cache = _LRU()
+        self._inflight: Dict[tuple, "asyncio.Future[Any]"] = {}
+
+        # Full-workspace symbol listings by limit, stored with the workspace state they were fetched in and the
+        # time they were fetched at, see _workspace_state
+        self._index_gen = 0
+        self._workspace_symbols_cache: Dict[Optional[int], Tuple[tuple, float, List[WorkspaceSymbol]]] = {}
 
         super().__init__(config, logger, repository_root_path, ProcessLaunchInfo(cmd, proc_env, proc_cwd), "swift")
 
+        # The handler silently drops messages while no process is running, and a dropped request is waited on forever.
+        # Fail fast instead, e.g. for inherited requests issued before a lazy start launched the process.
+        send_request = self.server.send.send_request
 
-    def _get_initialize_params(self, repository_absolute_path: str) -> InitializeParams:
-        """
-        Returns the initialize parameters for the XcodeBuildServer server.
-        """
+        async def checked_send_request(method: str, params: Optional[dict] = None) -> Any:
+            if not self._process_alive():
+                self.logger.log(f"{method} requested while the Language Server process is not running", logging.ERROR)
+                raise MultilspyException("Language Server process not running")
+            return await send_request(method, params)
 
-        with open(str(PurePath(os.path.dirname(__file__), "initialize_params.json")), "r") as f:
-            d: InitializeParams = json.load(f)
+        self.server.send.send_request = checked_send_request
 
-        if not os.path.isabs(repository_absolute_path):
-            repository_absolute_path = os.path.abspath(repository_absolute_path)
 
-        assert d["processId"] == "os.getpid()"
-        d["processId"] = os.getpid()
+    @classmethod
+    def get(cls, config: MultilspyConfig, logger: MultilspyLogger, repository_root_path: str) -> "XcodeBuildServer":
+        """
+        Returns the pooled XcodeBuildServer for the given repository, creating it on first use.
 
-        assert d["rootPath"] == "repository_absolute_path"
-        d["rootPath"] = repository_absolute_path
+        Every start_server context entered on the pooled instance shares one sourcekit-lsp process, so holding one
+        context open for a whole session (e.g. in a session-scoped test fixture) lets every other user skip the
+        cold start. The process is shut down when the last context exits.
 
-        assert d["rootUri"] == "pathlib.Path(repository_absolute_path).as_uri()"
-        d["rootUri"] = pathlib.Path(repository_absolute_path).as_uri()
+        Different configs get separate instances. A pooled instance keeps logging to the logger it was created with,
+        so a warning is logged when a different logger is passed.
+        """
+        # MultilspyConfig is an unhashable dataclass, its repr lists every field
+        key = (_SOURCEKIT_LSP_CMD, os.path.abspath(repository_root_path), repr(config))
+        server = _SERVER_POOL.get(key)
+        if server is None:
+            server = cls(config, logger, repository_root_path)
+            _SERVER_POOL[key] = server
+        elif server.logger is not logger:
+            logger.log(
+                f"Reusing the pooled XcodeBuildServer for {key[1]}, which logs to the logger it was created with",
+                logging.WARNING,
+            )
+        return server
 
-        assert (
-            d["workspaceFolders"]
-            == '[\n            {\n                "uri": pathlib.Path(repository_absolute_path).as_uri(),\n                "name": os.path.basename(repository_absolute_path),\n            }\n        ]'
-        )
+    async def _get_initialize_params(self) -> InitializeParams:
+        """
+        Returns the initialize parameters for the XcodeBuildServer server.
+        """
+        global _INIT_TEMPLATE
+        if _INIT_TEMPLATE is None:
+            # Read the template in a worker thread so the event loop is not blocked during startup
+            _INIT_TEMPLATE = await asyncio.get_running_loop().run_in_executor(None, _load_init_template)
+        d: InitializeParams = copy.deepcopy(_INIT_TEMPLATE)
+
+        d["processId"] = os.getpid()
+        d["rootPath"] = self.repository_root_path
+        d["rootUri"] = self._root_uri
         d["workspaceFolders"] = [
             {
-                "uri": pathlib.Path(repository_absolute_path).as_uri(),
-                "name": os.path.basename(repository_absolute_path),
+                "uri": self._root_uri,
+                "name": self._root_basename,
             }
         ]
 
-
-
         return d
 
     @asynccontextmanager
-    async def start_server(self) -> AsyncIterator["XcodeBuildServer"]:
+    async def start_server(self, lazy: bool = False) -> AsyncIterator["XcodeBuildServer"]:
         """
         Starts the XcodeBuildServer, waits for the server to be ready and yields the LanguageServer instance.
 
+        If lazy is True, the sourcekit-lsp process is only launched and initialized when the first request is made,
+        which takes the startup cost off the critical path for callers that may never issue a request. Files opened
+        before that are announced to the process once it is up.
+
         Usage:
         ```
         async with lsp.start_server():
@@ -117,13 +292,7 @@ class XcodeBuildServer(LanguageServer):
             for registration in params["registrations"]:
                 if registration["method"] == "textDocument/completion":
                     assert registration["registerOptions"]["resolveProvider"] == True
-                    assert registration["registerOptions"]["triggerCharacters"] == [
-                        ".",
-                        "@",
-                        "#",
-                        "*",
-                        " ",
-                    ]
+                    assert registration["registerOptions"]["triggerCharacters"] == _COMPLETION_TRIGGER_CHARACTERS
                     self.completions_available.set()
             return
 
@@ -134,29 +303,78 @@ class XcodeBuildServer(LanguageServer):
             if params["type"] == "ServiceReady" and params["message"] == "ServiceReady":
                 self.service_ready_event.set()
 
-        async def execute_client_command_handler(params):
-            #assert params["command"] == "_java.reloadBundles.command"
-            #assert params["arguments"] == []
-            return []
+        async def progress_handler(params):
+            # sourcekit-lsp reports background indexing and package resolution as work done progress,
+            # so the index may have changed whenever one of them ends
+            value = params.get("value")
+            if isinstance(value, dict) and value.get("kind") == "end":
+                self._index_gen += 1
 
         async def window_log_message(msg):
             self.logger.log(f"LSP: window/logMessage: {msg}", logging.INFO)
 
-        async def do_nothing(params):
-            return
-
         self.server.on_request("client/registerCapability", register_capability_handler)
         self.server.on_notification("language/status", lang_status_handler)
         self.server.on_notification("window/logMessage", window_log_message)
-        self.server.on_request("workspace/executeClientCommand", execute_client_command_handler)
-        self.server.on_notification("$/progress", do_nothing)
-        self.server.on_notification("textDocument/publishDiagnostics", do_nothing)
-        self.server.on_notification("language/actionableNotification", do_nothing)
+        self.server.on_request("workspace/executeClientCommand", _execute_client_command_handler)
+        self.server.on_request("window/workDoneProgress/create", _do_nothing)
+        self.server.on_notification("$/progress", progress_handler)
+        self.server.on_notification("textDocument/publishDiagnostics", _do_nothing)
+        self.server.on_notification("language/actionableNotification", _do_nothing)
+
+        # Nested and concurrent start_server contexts share the same server, which is shut down when the last one exits
+        self._refcount += 1
+        try:
+            if self._refcount == 1:
+                self._exit_stack = AsyncExitStack()
+                await self._exit_stack.enter_async_context(super().start_server())
+
+            if not lazy:
+                await self._ensure_started()
+
+            yield self
+        finally:
+            self._refcount -= 1
+            if self._refcount == 0:
+                try:
+                    if self._process_started and self._process_alive():
+                        await self.server.shutdown()
+                finally:
+                    self._process_started = False
+                    try:
+                        # Also releases the pipes and reader tasks of a process that died while idle
+                        await self.server.stop()
+                    finally:
+                        await self._exit_stack.aclose()
+
+    def _process_alive(self) -> bool:
+        """
+        Returns whether the sourcekit-lsp process has been launched and is still running.
+        """
+        process = self.server.process
+        return process is not None and process.returncode is None
+
+    async def _ensure_started(self) -> None:
+        """
+        Launches the sourcekit-lsp process and performs the initialize handshake, unless that has already happened.
+        A process that has exited since is transparently relaunched, and the files that are still open are opened
+        again in the new process. Concurrent callers wait for the same launch. Does nothing outside of start_server.
+        """
+        if (self._process_started and self._process_alive()) or not self.server_started:
+            return
+
+        async with self._start_lock:
+            if self._process_started:
+                if self._process_alive():
+                    return
+                self.logger.log("sourcekit-lsp process exited unexpectedly, restarting it", logging.WARNING)
+                self._process_started = False
+                # Release the pipes and reader tasks of the dead process before launching a new one
+                await self.server.stop()
 
-        async with super().start_server():
             self.logger.log("Starting XcodeBuildServer server process", logging.INFO)
             await self.server.start()
-            initialize_params = self._get_initialize_params(self.repository_root_path)
+            initialize_params = await self._get_initialize_params()
 
             self.logger.log(
                 "Sending initialize request from LSP client to LSP server and awaiting response",
@@ -167,14 +385,205 @@ class XcodeBuildServer(LanguageServer):
 
             self.server.notify.initialized({})
 
+            # Files opened before the launch, or still open when a previous process exited, are unknown to this
+            # process; their didOpen was dropped or went to the old one, so it is sent again with the current contents
+            for buffer in self.open_file_buffers.values():
+                self.server.notify.did_open_text_document(
+                    {
+                        "textDocument": {
+                            "uri": buffer.uri,
+                            "languageId": buffer.language_id,
+                            "version": buffer.version,
+                            "text": buffer.contents,
+                        }
+                    }
+                )
+
 
             # TODO: Add comments about why we wait here, and how this can be optimized
             # await self.service_ready_event.wait()
 
+            self._index_gen += 1
+            self._process_started = True
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator["XcodeBuildServer"]:
+        """
+        Coalesces the messages sent to the Language Server while the context is active, so that requests issued
+        together, e.g. through asyncio.gather, reach sourcekit-lsp with one write to its stdin instead of one each.
+        Requests can be awaited inside the context as usual. Nested batches are merged into the outermost one.
+
+        Usage:
+        ```
+        async with lsp.batch():
+            definition, hover = await asyncio.gather(
+                lsp.request_definition(...),
+                lsp.request_hover(...),
+            )
+        ```
+        """
+        await self._ensure_started()
+        process = self.server.process
+        if process is None or isinstance(process.stdin, _CoalescingWriter):
+            yield self
+            return
+
+        writer = _CoalescingWriter(process.stdin)
+        process.stdin = writer
+        try:
             yield self
+        finally:
+            writer.flush()
+            process.stdin = writer.writer
+
+    @contextmanager
+    def open_file(self, relative_file_path: str) -> Iterator[None]:
+        """
+        Same as LanguageServer.open_file, but also releases the file when the body raises, e.g. when the request
+        made inside it is cancelled, instead of leaving it open in the Language Server.
+        """
+        opened_file = super().open_file(relative_file_path)
+        opened_file.__enter__()
+        try:
+            yield
+        finally:
+            # LanguageServer.open_file only drops its reference and sends didClose when its body completes normally
+            opened_file.__exit__(None, None, None)
+
+    def _text_document_identifier(self, relative_file_path: str) -> Dict[str, str]:
+        """
+        Returns the TextDocumentIdentifier for the given file. Building the URI is the expensive part and is
+        memoized by _uri_for, so only the small dict around it is created per request.
+        """
+        return {"uri": _uri_for(self._root_uri, relative_file_path)}
+
+    def _workspace_state(self) -> tuple:
+        """
+        Returns the index generation and the versions of all open documents. Full-workspace symbol listings are only
+        reused while this stays the same; edits on disk outside of open documents are covered by a TTL instead.
+        """
+        return self._index_gen, tuple((uri, buffer.version) for uri, buffer in self.open_file_buffers.items())
+
+    def _document_state(self, relative_file_path: str) -> Optional[Tuple[int, int, Optional[int]]]:
+        """
+        Returns the index generation, the modification time of the given file on disk and the version of its open
+        buffer, if any. One of them changes whenever the document or what it refers to does, so they are part of
+        every response cache key.
 
-            await self.server.shutdown()
-            await self.server.stop()
+        Returns None if the Language Server is not started or the file cannot be stat'ed; callers then bypass the
+        cache, so that LanguageServer reports the error the same way it does for every other request.
+        """
+        if not self.server_started:
+            return None
+        absolute_file_path = str(PurePath(self.repository_root_path, relative_file_path))
+        try:
+            mtime = os.stat(absolute_file_path).st_mtime_ns
+        except OSError:
+            return None
+        buffer = self.open_file_buffers.get(_uri_for(self._root_uri, relative_file_path))
+        return self._index_gen, mtime, (buffer.version if buffer is not None else None)
+
+    async def _coalesced_request(
+        self, cache: _LRU, key: tuple, request: Callable[..., Awaitable[Any]], *args: Any
+    ) -> Any:
+        """
+        Returns the cached response for key if there is one. Otherwise waits for the debounce window and sends the
+        request, sharing a single request to the Language Server between all concurrent callers with the same key.
+        """
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            async def debounced_request():
+                await asyncio.sleep(_DEBOUNCE_SECONDS)
+                result = await request(*args)
+                cache[key] = result
+                return result
+
+            task = asyncio.ensure_future(debounced_request())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shield the shared request so that one cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+
+    async def request_references(
+        self, relative_file_path: str, line: int, column: int
+    ) -> List[multilspy_types.Location]:
+        """
+        Same as LanguageServer.request_references, but launches the Language Server first if it was started lazily.
+        """
+        await self._ensure_started()
+        return await super().request_references(relative_file_path, line, column)
+
+    async def request_completions(
+        self, relative_file_path: str, line: int, column: int, allow_incomplete: bool = False
+    ) -> List[multilspy_types.CompletionItem]:
+        """
+        Same as LanguageServer.request_completions, but launches the Language Server first if it was started lazily.
+        """
+        await self._ensure_started()
+        return await super().request_completions(relative_file_path, line, column, allow_incomplete)
+
+    async def request_workspace_symbol(self, query: str) -> Union[List[multilspy_types.UnifiedSymbolInformation], None]:
+        """
+        Same as LanguageServer.request_workspace_symbol, but launches the Language Server first if it was started lazily.
+        """
+        await self._ensure_started()
+        return await super().request_workspace_symbol(query)
+
+    async def request_definition(
+        self, relative_file_path: str, line: int, column: int
+    ) -> List[multilspy_types.Location]:
+        """
+        Same as LanguageServer.request_definition, but answers repeated requests for an unchanged document from a cache
+        and coalesces concurrent requests for the same position.
+        """
+        await self._ensure_started()
+        state = self._document_state(relative_file_path)
+        if state is None:
+            return await super().request_definition(relative_file_path, line, column)
+        key = ("textDocument/definition", relative_file_path, line, column, state)
+        return await self._coalesced_request(
+            self._def_cache, key, super().request_definition, relative_file_path, line, column
+        )
+
+    async def request_hover(
+        self, relative_file_path: str, line: int, column: int
+    ) -> Union[multilspy_types.Hover, None]:
+        """
+        Same as LanguageServer.request_hover, but answers repeated requests for an unchanged document from a cache
+        and coalesces concurrent requests for the same position.
+        """
+        await self._ensure_started()
+        state = self._document_state(relative_file_path)
+        if state is None:
+            return await super().request_hover(relative_file_path, line, column)
+        key = ("textDocument/hover", relative_file_path, line, column, state)
+        return await self._coalesced_request(
+            self._hover_cache, key, super().request_hover, relative_file_path, line, column
+        )
+
+    async def request_document_symbols(
+        self, relative_file_path: str
+    ) -> Tuple[List[multilspy_types.UnifiedSymbolInformation], Union[List[multilspy_types.TreeRepr], None]]:
+        """
+        Same as LanguageServer.request_document_symbols, but answers repeated requests for an unchanged document from a cache.
+        """
+        await self._ensure_started()
+        state = self._document_state(relative_file_path)
+        if state is None:
+            return await super().request_document_symbols(relative_file_path)
+        key = (relative_file_path, state)
+        if key in self._symbols_cache:
+            self._symbols_cache.move_to_end(key)
+            return self._symbols_cache[key]
+
+        result = await super().request_document_symbols(relative_file_path)
+        self._symbols_cache[key] = result
+        return result
 
     async def request_rename(
         self, relative_file_path: str, line: int, column: int, new_name: str
@@ -196,41 +605,46 @@ class XcodeBuildServer(LanguageServer):
                 logging.ERROR,
             )
             raise MultilspyException("Language Server not started")
+        await self._ensure_started()
 
         with self.open_file(relative_file_path):
-            # sending request to the language server and waiting for response
-            response = await self.server.send.rename(
-                {
-                    "textDocument": {
-                        "uri": pathlib.Path(os.path.join(self.repository_root_path, relative_file_path)).as_uri()
-                    },
-                    "position": {"line": line, "character": column},
-                    "newName": new_name
-                }
-            )
+            # The handler assigns the next request id synchronously when the request is sent
+            request_id = self.server.request_id
+            try:
+                # sending request to the language server and waiting for response
+                response = await self.server.send.rename(
+                    {
+                        "textDocument": self._text_document_identifier(relative_file_path),
+                        "position": {"line": line, "character": column},
+                        "newName": new_name
+                    }
+                )
+            except asyncio.CancelledError:
+                # Let sourcekit-lsp abandon a rename whose result nobody is waiting for anymore
+                self.server.send_notification("$/cancelRequest", {"id": request_id})
+                raise
 
-        ret: Dict[str, List[TextEdit]] = {}
         assert isinstance(response, dict)
         assert "changes" in response
 
-        for uri, changes in response["changes"].items():
-            assert isinstance(changes, list)
-            edits: List[TextEdit] = []
-            for change in changes:
-                assert isinstance(change, dict)
-                assert "range" in change
-                assert "newText" in change
-                edits.append(TextEdit(**change))
-            ret[uri] = edits
+        if sum(map(len, response["changes"].values())) > _RENAME_OFFLOAD_THRESHOLD:
+            # Large cross-file renames are converted in a worker thread to keep the event loop responsive
+            return await asyncio.get_running_loop().run_in_executor(None, _parse_rename_response, response)
+        return _parse_rename_response(response)
 
-        return ret
-
-    async def request_workspace_symbols(self, query: str) -> List[WorkspaceSymbol]:
+    async def request_workspace_symbols(
+        self, query: str, limit: Optional[int] = _WORKSPACE_SYMBOLS_LIMIT
+    ) -> List[WorkspaceSymbol]:
         """
         Raise a [workspace/symbol](https://microsoft.github.io/language-server-protocol/specifications/lsp/3.17/specification/#workspace_symbol) request to the Language Server
         to search for symbols matching the query across all files in the workspace. Wait for the response and return the result.
 
+        Blank queries list every symbol in the workspace. Their result is cached until sourcekit-lsp ends a work done
+        progress such as background indexing, an open document changes, or 30 seconds have passed.
+
         :param query: The query string to match against symbol names
+        :param limit: The maximum number of symbols to return, or None to return all of them. Defaults to 10000;
+            a warning is logged whenever the result is truncated
 
         :return List[WorkspaceSymbol]: A list of workspace symbols matching the query
         """
@@ -240,31 +654,41 @@ class XcodeBuildServer(LanguageServer):
                 logging.ERROR,
             )
             raise MultilspyException("Language Server not started")
+        await self._ensure_started()
+
+        full_listing = not query.strip()
+        # Read before sending, so a change while the request is in flight keeps its result out of the cache
+        state = self._workspace_state()
+        fetched_at = time.monotonic()
+        if full_listing:
+            cached = self._workspace_symbols_cache.get(limit)
+            if cached is not None and cached[0] == state and fetched_at - cached[1] < _WORKSPACE_SYMBOLS_TTL:
+                return cached[2]
 
         response = await self.server.send.workspace_symbol({"query": query})
         if response is None:
             return []
 
-        ret: List[WorkspaceSymbol] = []
         assert isinstance(response, list)
+        if limit is not None and len(response) > limit:
+            self.logger.log(
+                f"workspace/symbol returned {len(response)} symbols for query {query!r}, only the first {limit} are returned. "
+                "Pass limit=None to request_workspace_symbols to get all of them.",
+                logging.WARNING,
+            )
 
-        for item in response:
-            assert isinstance(item, dict)
-            # Create base symbol with required fields
-            symbol: WorkspaceSymbol = {
+        ret: List[WorkspaceSymbol] = [
+            {
                 "name": item["name"],
                 "kind": item["kind"],
-                "location": (
-                    item["location"] if isinstance(item["location"], dict) and "range" in item["location"]
-                    else {"uri": item["location"]["uri"]}
-                )
+                "location": item["location"] if "range" in item["location"] else {"uri": item["location"]["uri"]},
+                # Optional fields are only copied over if present
+                **{field: item[field] for field in ("containerName", "tags", "data") if field in item},
             }
-            
-            # Add optional fields if present
-            for field in ["containerName", "tags", "data"]:
-                if field in item:
-                    symbol[field] = item[field]
-            
-            ret.append(symbol)
+            for item in itertools.islice(response, limit)
+        ]
+
+        if full_listing and state == self._workspace_state():
+            self._workspace_symbols_cache[limit] = (state, fetched_at, ret)
 
         return ret
\ No newline at end of file
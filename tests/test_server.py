@@ -1,5 +1,91 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
 import unittest
-from multispy_xcode_build_server.server import XcodeBuildServer
+import unittest.mock
+import pathlib
+from multilspy.multilspy_config import MultilspyConfig
+from multilspy.multilspy_logger import MultilspyLogger
+from multilspy.multilspy_exceptions import MultilspyException
+from multispy_xcode_build_server.server import _SERVER_POOL, XcodeBuildServer, _LRU, _parse_rename_response, _uri_for
+
+INITIALIZE_RESULT = {"capabilities": {"textDocumentSync": {"change": 2}}}
+
+class FakeSourceKitLSP:
+    """
+    Stands in for the sourcekit-lsp process. Records every message written to its stdin and answers each request
+    with the result registered for its method; requests for methods listed in held are never answered.
+    """
+
+    def __init__(self, handler, results, held=()):
+        self.handler = handler
+        self.results = {"initialize": INITIALIZE_RESULT, **results}
+        self.held = set(held)
+        self.received = []
+        self.writes = []
+        self.drains = []
+        self.returncode = None
+        self.stdin = self
+        self.stdout = None
+        self.stderr = None
+        self._buffer = b""
+
+    def methods(self):
+        return [payload.get("method") for payload in self.received]
+
+    def write(self, data):
+        self.writes.append(data)
+        self._buffer += data
+        while b"\r\n\r\n" in self._buffer:
+            header, rest = self._buffer.split(b"\r\n\r\n", 1)
+            length = int(header.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            body, self._buffer = rest[:length], rest[length:]
+            self._receive(json.loads(body))
+
+    def writelines(self, data):
+        self.write(b"".join(data))
+
+    def _receive(self, payload):
+        self.received.append(payload)
+        if "id" in payload and "method" in payload and payload["method"] not in self.held:
+            response = {"jsonrpc": "2.0", "id": payload["id"], "result": self.results.get(payload["method"])}
+            asyncio.get_running_loop().call_soon(asyncio.ensure_future, self.handler._receive_payload(response))
+
+    async def drain(self):
+        self.drains.append(len(self.received))
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        self.returncode = 0
+
+def attach_fake_process(server, results=None, held=()):
+    """Makes server launch a FakeSourceKitLSP instead of sourcekit-lsp, returns the list of launched processes."""
+    processes = []
+
+    async def start():
+        server.server.process = FakeSourceKitLSP(server.server, results or {}, held)
+        processes.append(server.server.process)
+
+    async def stop():
+        process, server.server.process = server.server.process, None
+        if process is not None:
+            process.terminate()
+
+    server.server.start = start
+    server.server.stop = stop
+    return processes
+
+def make_server(repository_root_path=None):
+    if repository_root_path is None:
+        repository_root_path = tempfile.mkdtemp()
+        with open(os.path.join(repository_root_path, "a.swift"), "w") as f:
+            f.write("let a = 1\n")
+    config = MultilspyConfig.from_dict({"code_language": "swift"})
+    return XcodeBuildServer(config, MultilspyLogger(), repository_root_path)
 
 class TestXcodeBuildServer(unittest.TestCase):
     def setUp(self):
@@ -8,4 +94,338 @@ class TestXcodeBuildServer(unittest.TestCase):
     def test_initialization(self):
         self.assertFalse(self.server.initialized)
         self.server.initialize()
-        self.assertTrue(self.server.initialized) 
\ No newline at end of file
+        self.assertTrue(self.server.initialized)
+
+class TestLRU(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = _LRU(maxsize=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache.move_to_end("a")
+        cache["c"] = 3
+        self.assertEqual(list(cache), ["a", "c"])
+
+class TestParseRenameResponse(unittest.TestCase):
+    def test_keeps_only_text_edit_fields(self):
+        edit_range = {"start": {"line": 1, "character": 2}, "end": {"line": 1, "character": 5}}
+        response = {
+            "changes": {
+                "file:///a.swift": [{"range": edit_range, "newText": "bar", "annotationId": "x"}],
+                "file:///b.swift": [],
+            }
+        }
+        self.assertEqual(
+            _parse_rename_response(response),
+            {"file:///a.swift": [{"range": edit_range, "newText": "bar"}], "file:///b.swift": []},
+        )
+
+class TestUriFor(unittest.TestCase):
+    def test_matches_pathlib(self):
+        root = "/tmp/my project"
+        root_uri = pathlib.Path(root).as_uri()
+        for relative_file_path in ["a.swift", "./Sources/Main View.swift", "/abs/b.swift"]:
+            self.assertEqual(
+                _uri_for(root_uri, relative_file_path),
+                pathlib.Path(str(pathlib.PurePath(root, relative_file_path))).as_uri(),
+            )
+
+class TestCoalescedRequest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = make_server()
+        self.calls = 0
+
+    async def request(self, result):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def test_concurrent_callers_share_one_request(self):
+        cache = _LRU()
+        results = await asyncio.gather(
+            *(self.server._coalesced_request(cache, ("hover", 1), self.request, "result") for _ in range(3))
+        )
+        self.assertEqual(results, ["result"] * 3)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(await self.server._coalesced_request(cache, ("hover", 1), self.request, "other"), "result")
+        self.assertEqual(self.calls, 1)
+
+    async def test_failed_request_is_not_kept(self):
+        cache = _LRU()
+        with self.assertRaises(ValueError):
+            await self.server._coalesced_request(cache, ("hover", 1), self.request, ValueError("failed"))
+        self.assertEqual(self.server._inflight, {})
+        self.assertNotIn(("hover", 1), cache)
+        self.assertEqual(await self.server._coalesced_request(cache, ("hover", 1), self.request, "result"), "result")
+        self.assertEqual(self.calls, 2)
+
+    async def test_cancelling_one_caller_keeps_the_request_for_others(self):
+        cache = _LRU()
+        first = asyncio.ensure_future(self.server._coalesced_request(cache, ("hover", 1), self.request, "result"))
+        second = asyncio.ensure_future(self.server._coalesced_request(cache, ("hover", 1), self.request, "result"))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "result")
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.calls, 1)
+
+class TestWorkspaceSymbolsLimit(unittest.IsolatedAsyncioTestCase):
+    async def test_truncation_is_logged(self):
+        server = make_server()
+        server.server_started = True
+        server._ensure_started = unittest.mock.AsyncMock()
+        symbols = [{"name": f"s{i}", "kind": 12, "location": {"uri": "file:///a.swift"}} for i in range(3)]
+        server.server.send.workspace_symbol = unittest.mock.AsyncMock(return_value=symbols)
+        with unittest.mock.patch.object(server.logger, "log") as log:
+            self.assertEqual(len(await server.request_workspace_symbols("s", limit=2)), 2)
+        self.assertIn("only the first 2", log.call_args.args[0])
+        self.assertEqual(len(await server.request_workspace_symbols("s", limit=None)), 3)
+
+class TestLazyStart(unittest.IsolatedAsyncioTestCase):
+    async def test_files_opened_before_launch_are_announced(self):
+        server = make_server()
+        processes = attach_fake_process(server)
+        async with server.start_server(lazy=True):
+            self.assertEqual(processes, [])
+            with server.open_file("a.swift"):
+                await server.request_hover("a.swift", 0, 4)
+        self.assertEqual(len(processes), 1)
+        methods = processes[0].methods()
+        self.assertEqual(
+            methods[:4], ["initialize", "initialized", "textDocument/didOpen", "textDocument/hover"]
+        )
+        self.assertIn("textDocument/didClose", methods)
+
+    async def test_inherited_requests_launch_the_server(self):
+        server = make_server()
+        processes = attach_fake_process(server, {"workspace/symbol": []})
+        async with server.start_server(lazy=True):
+            self.assertEqual(await asyncio.wait_for(server.request_workspace_symbol("a"), 5), [])
+        self.assertEqual(len(processes), 1)
+
+    async def test_requests_without_process_fail_instead_of_hanging(self):
+        server = make_server()
+        attach_fake_process(server)
+        async with server.start_server(lazy=True):
+            with self.assertRaises(MultilspyException):
+                await asyncio.wait_for(server.server.send.hover({}), 5)
+
+class TestRenameCancellation(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_notifies_server_and_closes_file(self):
+        server = make_server()
+        processes = attach_fake_process(server, held=["textDocument/rename"])
+        async with server.start_server():
+            rename = asyncio.ensure_future(server.request_rename("a.swift", 0, 4, "b"))
+            while "textDocument/rename" not in processes[0].methods():
+                await asyncio.sleep(0)
+            rename.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await rename
+
+            received = processes[0].received
+            rename_id = next(p["id"] for p in received if p.get("method") == "textDocument/rename")
+            cancel = next(p for p in received if p.get("method") == "$/cancelRequest")
+            self.assertEqual(cancel["params"], {"id": rename_id})
+            self.assertEqual(received[-1]["method"], "textDocument/didClose")
+            self.assertEqual(server.open_file_buffers, {})
+
+class TestDocumentCache(unittest.IsolatedAsyncioTestCase):
+    HOVER = {"contents": {"kind": "markdown", "value": "let a: Int"}}
+
+    async def asyncSetUp(self):
+        self.server = make_server()
+        self.processes = attach_fake_process(
+            self.server, {"textDocument/hover": self.HOVER, "textDocument/documentSymbol": []}
+        )
+        self.path = os.path.join(self.server.repository_root_path, "a.swift")
+
+    def requests_sent(self, method):
+        return self.processes[0].methods().count(method)
+
+    def touch(self):
+        mtime = os.stat(self.path).st_mtime_ns + 1_000_000_000
+        os.utime(self.path, ns=(mtime, mtime))
+
+    async def test_hover_is_cached_per_document_state(self):
+        async with self.server.start_server():
+            self.assertEqual(await self.server.request_hover("a.swift", 0, 4), self.HOVER)
+            self.assertEqual(await self.server.request_hover("a.swift", 0, 4), self.HOVER)
+            self.assertEqual(self.requests_sent("textDocument/hover"), 1)
+
+            self.touch()
+            await self.server.request_hover("a.swift", 0, 4)
+            self.assertEqual(self.requests_sent("textDocument/hover"), 2)
+
+            with self.server.open_file("a.swift"):
+                await self.server.request_hover("a.swift", 0, 4)
+                self.assertEqual(self.requests_sent("textDocument/hover"), 3)
+                self.server.insert_text_at_position("a.swift", 0, 0, "// ")
+                await self.server.request_hover("a.swift", 0, 4)
+                self.assertEqual(self.requests_sent("textDocument/hover"), 4)
+
+            await self.server.server._receive_payload(
+                {"jsonrpc": "2.0", "method": "$/progress", "params": {"token": "indexing", "value": {"kind": "end"}}}
+            )
+            await self.server.request_hover("a.swift", 0, 4)
+            self.assertEqual(self.requests_sent("textDocument/hover"), 5)
+
+    async def test_document_symbols_are_cached_until_the_file_changes(self):
+        async with self.server.start_server():
+            await self.server.request_document_symbols("a.swift")
+            await self.server.request_document_symbols("a.swift")
+            self.assertEqual(self.requests_sent("textDocument/documentSymbol"), 1)
+
+            self.touch()
+            await self.server.request_document_symbols("a.swift")
+            self.assertEqual(self.requests_sent("textDocument/documentSymbol"), 2)
+
+    async def test_errors_match_language_server(self):
+        with self.assertRaisesRegex(MultilspyException, "not started"):
+            await self.server.request_hover("a.swift", 0, 4)
+        async with self.server.start_server():
+            with self.assertRaisesRegex(MultilspyException, "File read failed"):
+                await self.server.request_hover("missing.swift", 0, 4)
+
+class TestBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_gathered_requests_are_written_together(self):
+        server = make_server()
+        processes = attach_fake_process(server, {"textDocument/definition": []})
+        async with server.start_server():
+            process = processes[0]
+            writes, drains = len(process.writes), len(process.drains)
+            async with server.batch():
+                self.assertIsNot(process.stdin, process)
+                await asyncio.gather(server.request_hover("a.swift", 0, 4), server.request_definition("a.swift", 0, 4))
+            self.assertIs(process.stdin, process)
+
+            batched = process.writes[writes]
+            self.assertIn(b'"textDocument/hover"', batched)
+            self.assertIn(b'"textDocument/definition"', batched)
+            # Both requests had been written by the time either of them waited for the pipe to drain
+            requests = process.methods().index("textDocument/definition") + 1
+            self.assertTrue(all(count >= requests for count in process.drains[drains:]))
+
+class TestSharedLifetime(unittest.IsolatedAsyncioTestCase):
+    async def test_nested_contexts_share_one_process(self):
+        server = make_server()
+        processes = attach_fake_process(server)
+        async with server.start_server():
+            async with server.start_server():
+                self.assertEqual(len(processes), 1)
+            self.assertTrue(server.server_started)
+            self.assertNotIn("shutdown", processes[0].methods())
+            await server.request_hover("a.swift", 0, 4)
+        self.assertFalse(server.server_started)
+        self.assertEqual(processes[0].methods().count("shutdown"), 1)
+        self.assertEqual(len(processes), 1)
+
+    async def test_crash_while_idle_then_exit(self):
+        server = make_server()
+        processes = attach_fake_process(server)
+        async with server.start_server():
+            processes[0].returncode = 1
+        self.assertFalse(server.server_started)
+        self.assertFalse(server._process_started)
+        self.assertIsNone(server.server.process)
+        self.assertNotIn("shutdown", processes[0].methods())
+
+    async def test_crash_while_idle_keeps_the_original_error(self):
+        server = make_server()
+        processes = attach_fake_process(server)
+        with self.assertRaises(ValueError):
+            async with server.start_server():
+                processes[0].returncode = 1
+                raise ValueError("body failed")
+        self.assertFalse(server.server_started)
+        self.assertIsNone(server.server.process)
+
+    async def test_crashed_process_is_relaunched_with_open_files(self):
+        server = make_server()
+        processes = attach_fake_process(server)
+        async with server.start_server():
+            with server.open_file("a.swift"):
+                processes[0].returncode = 1
+                await server.request_hover("a.swift", 0, 4)
+            self.assertEqual(len(processes), 2)
+            self.assertEqual(
+                processes[1].methods(),
+                ["initialize", "initialized", "textDocument/didOpen", "textDocument/hover", "textDocument/didClose"],
+            )
+
+class TestServerPool(unittest.TestCase):
+    def setUp(self):
+        # Keep the instances created here out of the process-wide pool
+        patcher = unittest.mock.patch.dict(_SERVER_POOL, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_pools_per_repository_and_config(self):
+        root = tempfile.mkdtemp()
+        config = MultilspyConfig.from_dict({"code_language": "swift"})
+        traced = MultilspyConfig.from_dict({"code_language": "swift", "trace_lsp_communication": True})
+        logger = MultilspyLogger()
+        server = XcodeBuildServer.get(config, logger, root)
+        self.assertIs(XcodeBuildServer.get(MultilspyConfig.from_dict({"code_language": "swift"}), logger, root), server)
+        self.assertIsNot(XcodeBuildServer.get(traced, logger, root), server)
+        self.assertIsNot(XcodeBuildServer.get(config, logger, tempfile.mkdtemp()), server)
+
+    def test_get_warns_about_ignored_logger(self):
+        root = tempfile.mkdtemp()
+        config = MultilspyConfig.from_dict({"code_language": "swift"})
+        server = XcodeBuildServer.get(config, MultilspyLogger(), root)
+        other_logger = MultilspyLogger()
+        with unittest.mock.patch.object(other_logger, "log") as log:
+            self.assertIs(XcodeBuildServer.get(config, other_logger, root), server)
+        self.assertEqual(log.call_count, 1)
+
+class TestWorkspaceSymbolsCache(unittest.IsolatedAsyncioTestCase):
+    SYMBOLS = [{"name": "a", "kind": 13, "location": {"uri": "file:///a.swift"}}]
+
+    async def asyncSetUp(self):
+        self.server = make_server()
+        self.processes = attach_fake_process(self.server, {"workspace/symbol": self.SYMBOLS})
+
+    def requests_sent(self):
+        return self.processes[0].methods().count("workspace/symbol")
+
+    async def progress(self, kind):
+        await self.server.server._receive_payload(
+            {"jsonrpc": "2.0", "method": "$/progress", "params": {"token": "indexing", "value": {"kind": kind}}}
+        )
+
+    async def test_blank_query_is_cached_until_progress_ends(self):
+        async with self.server.start_server():
+            await self.server.request_workspace_symbols(" ")
+            await self.server.request_workspace_symbols("")
+            self.assertEqual(self.requests_sent(), 1)
+
+            await self.progress("begin")
+            await self.server.request_workspace_symbols(" ")
+            self.assertEqual(self.requests_sent(), 1)
+
+            await self.progress("end")
+            await self.server.request_workspace_symbols(" ")
+            self.assertEqual(self.requests_sent(), 2)
+
+            # Non-blank queries are never cached
+            await self.server.request_workspace_symbols("a")
+            await self.server.request_workspace_symbols("a")
+            self.assertEqual(self.requests_sent(), 4)
+
+    async def test_open_document_changes_invalidate_the_cache(self):
+        async with self.server.start_server():
+            await self.server.request_workspace_symbols(" ")
+            with self.server.open_file("a.swift"):
+                await self.server.request_workspace_symbols(" ")
+                self.assertEqual(self.requests_sent(), 2)
+                self.server.insert_text_at_position("a.swift", 0, 0, "// ")
+                await self.server.request_workspace_symbols(" ")
+                self.assertEqual(self.requests_sent(), 3)
+
+    async def test_cached_listing_expires(self):
+        async with self.server.start_server():
+            await self.server.request_workspace_symbols(" ")
+            with unittest.mock.patch("multispy_xcode_build_server.server.time.monotonic", return_value=time.monotonic() + 60):
+                await self.server.request_workspace_symbols(" ")
+            self.assertEqual(self.requests_sent(), 2)